@@ -8,7 +8,7 @@ extern crate torchrs;
 extern crate clap;
 
 use torchrs::autograd::{Variable, VariableArgs, VarAccess};
-use torchrs::{optim, utils, nn, tensor};
+use torchrs::{optim, utils, nn, tensor, distributed, torch};
 use torchrs::nn::{InitModuleStruct, GetFieldStruct, ModIntf, ModDelegate, Module};
 use torchrs::nn::functional as F;
 use torchrs::utils::data as D;
@@ -33,6 +33,10 @@ struct NetArgs {
     seed: usize,
     #[builder(default="10")]
     log_interval: usize,
+    #[builder(default="1")]
+    nprocs: usize,
+    #[builder(default="None")]
+    checkpoint: Option<String>,
 }
 
 impl Default for NetArgs {
@@ -55,15 +59,18 @@ fn parse_args() -> NetArgs {
         .arg(Arg::with_name("no-cuda").takes_value(false))
         .arg(Arg::with_name("seed").takes_value(true))
         .arg(Arg::with_name("log-interval").takes_value(true))
+        .arg(Arg::with_name("nprocs").takes_value(true))
+        .arg(Arg::with_name("checkpoint").takes_value(true))
         .get_matches();
-    let (b_size, tb_size, epochs, lr, momentum, seed, log_int) =
+    let (b_size, tb_size, epochs, lr, momentum, seed, log_int, nprocs) =
         (value_t!(matches.value_of("batch-size"), usize).ok(),
          value_t!(matches.value_of("test-batch-size"), usize).ok(),
          value_t!(matches.value_of("epochs"), u32).ok(),
          value_t!(matches.value_of("lr"), f32).ok(),
          value_t!(matches.value_of("momentum"), f32).ok(),
          value_t!(matches.value_of("seed"), usize).ok(),
-         value_t!(matches.value_of("log-interval"), usize).ok());
+         value_t!(matches.value_of("log-interval"), usize).ok(),
+         value_t!(matches.value_of("nprocs"), usize).ok());
     if let Some(b_size) = b_size {
         args.batch_size = b_size
     }
@@ -85,6 +92,12 @@ fn parse_args() -> NetArgs {
     if let Some(log_int) = log_int {
         args.log_interval = log_int
     }
+    if let Some(nprocs) = nprocs {
+        args.nprocs = nprocs
+    }
+    if let Some(checkpoint) = matches.value_of("checkpoint") {
+        args.checkpoint = Some(checkpoint.to_string())
+    }
     //XXX CUDA?
     args
 }
@@ -133,7 +146,8 @@ fn train(model: &mut Net<f32>,
          args: &NetArgs,
          train_loader: &D::BatchLoader<f32, i64>,
          epoch: u32,
-         optimizer: &mut optim::OptIntf<f32>) {
+         optimizer: &mut optim::OptIntf<f32>,
+         mut ddp: Option<&mut nn::DistributedDataParallel<f32>>) {
     model.train();
     for (batch_idx, (ref data, ref target)) in train_loader.iter().enumerate() {
         let (mut data, target) = if args.cuda {
@@ -145,8 +159,12 @@ fn train(model: &mut Net<f32>,
         let output = model.f(data.clone());
         let mut loss = F::nll_loss(output, target, None, &F::NLLLossArgs::default());
         loss.backward();
+        if let Some(ref mut ddp) = ddp {
+            ddp.sync_gradients(model);
+        }
         optimizer.step(model);
-        if batch_idx % args.log_interval == 0 {
+        let rank = ddp.as_ref().map_or(0, |ddp| ddp.rank);
+        if rank == 0 && batch_idx % args.log_interval == 0 {
             println!("Train Epoch: {} [{}/{} ({:.0}%)]\tLoss: {:.6}",
                      epoch,
                      batch_idx * data.data().len(),
@@ -192,11 +210,28 @@ fn test(model: &mut Net<f32>, args: &NetArgs, test_loader: &D::BatchLoader<f32,
 
 fn main() {
     let args = parse_args();
-    let train_loader: D::BatchLoader<f32, i64> = D::DataLoader::build()
-        .batch_size(args.batch_size)
-        .done(datasets::MNIST::<f32>::build("../data")
-                  .download(false)
-                  .done(None));
+    if args.nprocs > 1 && !distributed::is_worker() {
+        distributed::launch(args.nprocs, distributed::DEFAULT_CAPACITY).expect("launch failed");
+        return;
+    }
+    let group = if args.nprocs > 1 {
+        Some(distributed::init_process_group().expect("failed to join process group"))
+    } else {
+        None
+    };
+    let train_set = datasets::MNIST::<f32>::build("../data")
+        .download(false)
+        .done(None);
+    let mut train_args = D::DataLoader::build().batch_size(args.batch_size);
+    if let Some(ref group) = group {
+        train_args = train_args.sampler(Some(D::DistributedSampler::new(train_set.len(),
+                                                                         args.batch_size,
+                                                                         group.rank,
+                                                                         group.world_size,
+                                                                         true,
+                                                                         args.seed)));
+    }
+    let train_loader: D::BatchLoader<f32, i64> = train_args.done(train_set);
 
     let test_loader: D::BatchLoader<f32, i64> = D::DataLoader::build()
         .batch_size(args.batch_size)
@@ -204,9 +239,30 @@ fn main() {
                   .train(false)
                   .done(None));
     let mut model = Net::new();
+    let mut ddp = group.map(|group| nn::DistributedDataParallel::<f32>::new(group, &mut model));
     let mut optimizer = optim::SGD::new(map_opt!{"lr" => args.lr, "momentum" => args.momentum});
+    let rank = ddp.as_ref().map_or(0, |ddp| ddp.rank);
+    // written in the background by rank 0 after every epoch
+    let mut checkpointer = match args.checkpoint {
+        Some(ref path) if rank == 0 => Some((path.clone(), torch::AsyncCheckpointer::<f32>::new(2))),
+        _ => None,
+    };
     for epoch in 1..args.epochs + 1 {
-        train(&mut model, &args, &train_loader, epoch, &mut optimizer);
-        test(&mut model, &args, &test_loader);
+        train_loader.sampler.set_epoch(epoch as usize);
+        train(&mut model,
+              &args,
+              &train_loader,
+              epoch,
+              &mut optimizer,
+              ddp.as_mut());
+        if rank == 0 {
+            test(&mut model, &args, &test_loader);
+        }
+        if let Some((ref path, ref mut checkpointer)) = checkpointer {
+            checkpointer.save(path, &mut model, &mut optimizer).expect("checkpoint failed");
+        }
+    }
+    if let Some((_, ref mut checkpointer)) = checkpointer {
+        checkpointer.wait().expect("checkpoint failed");
     }
 }
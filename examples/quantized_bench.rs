@@ -0,0 +1,63 @@
+extern crate torchrs;
+
+use std::time::Instant;
+use torchrs::autograd::{Variable, VariableArgs};
+use torchrs::nn::{self, ModIntf};
+use torchrs::nn::quantized;
+use torchrs::tensor::Tensor;
+use torchrs::torch;
+
+static ITERS: u32 = 50;
+
+fn input(dims: Vec<usize>) -> Variable<f32> {
+    let mut t: Tensor<f32> = torch::tensor(dims);
+    t.uniform_((-1., 1.));
+    let args = VariableArgs {
+        volatile: true,
+        ..Default::default()
+    };
+    Variable::new_args(t, &args)
+}
+
+// milliseconds per forward pass
+fn time(model: &mut ModIntf<f32>, x: &Variable<f32>) -> f64 {
+    model.f(x.clone());
+    let start = Instant::now();
+    for _ in 0..ITERS {
+        model.f(x.clone());
+        model.free_graph();
+    }
+    let elapsed = start.elapsed();
+    (elapsed.as_secs() as f64 * 1e3 + elapsed.subsec_nanos() as f64 / 1e6) / ITERS as f64
+}
+
+// float forward in eval mode against the int8 path of the same module
+fn compare(name: &str, model: &mut ModIntf<f32>, x: Variable<f32>) {
+    model.eval();
+    let float = time(model, &x);
+    quantized::prepare(model);
+    model.f(x.clone());
+    quantized::convert(model);
+    quantized::enable(model);
+    let int8 = time(model, &x);
+    println!("{:<28} float {:8.3}ms  int8 {:8.3}ms  speedup {:.2}x",
+             name,
+             float,
+             int8,
+             float / int8);
+}
+
+fn main() {
+    compare("linear 64x320 -> 50",
+            &mut nn::Linear::<f32>::build(320, 50).done(),
+            input(vec![64, 320]));
+    compare("linear 64x800 -> 500",
+            &mut nn::Linear::<f32>::build(800, 500).done(),
+            input(vec![64, 800]));
+    compare("conv 64x1x28x28 k5 -> 10",
+            &mut nn::Conv2d::<f32>::build(1, 10, (5, 5)).done(),
+            input(vec![64, 1, 28, 28]));
+    compare("conv 64x10x12x12 k5 -> 20",
+            &mut nn::Conv2d::<f32>::build(10, 20, (5, 5)).done(),
+            input(vec![64, 10, 12, 12]));
+}
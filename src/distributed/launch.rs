@@ -0,0 +1,102 @@
+use std::env;
+use std::io::{self, Error, ErrorKind};
+use std::path::Path;
+use std::process::{Child, Command};
+use std::thread;
+use std::time::Duration;
+use distributed::{ProcessGroup, shm_path, remove_shm};
+
+static RANK: &str = "TORCHRS_RANK";
+static WORLD_SIZE: &str = "TORCHRS_WORLD_SIZE";
+static SHM_PATH: &str = "TORCHRS_SHM_PATH";
+static CAPACITY: &str = "TORCHRS_SHM_CAPACITY";
+
+// 4MB per rank slot, i.e. 1M f32 gradient elements per bucket
+pub static DEFAULT_CAPACITY: usize = 4 << 20;
+
+fn env_usize(key: &str) -> io::Result<usize> {
+    let value = env::var(key).map_err(|_| Error::new(ErrorKind::NotFound, key.to_string()))?;
+    value
+        .parse()
+        .map_err(|_| Error::new(ErrorKind::InvalidInput, format!("bad {}: {}", key, value)))
+}
+
+/// True when running as a worker started by `launch`.
+pub fn is_worker() -> bool {
+    env::var(RANK).is_ok()
+}
+
+fn kill_all(children: &mut Vec<Child>) {
+    for mut child in children.drain(..) {
+        let _ = child.kill();
+        let _ = child.wait();
+    }
+}
+
+fn run_workers(path: &Path, nprocs: usize, capacity: usize) -> io::Result<()> {
+    let exe = env::current_exe()?;
+    let args: Vec<String> = env::args().skip(1).collect();
+    let mut children = Vec::with_capacity(nprocs);
+    for rank in 0..nprocs {
+        let spawned = Command::new(&exe)
+            .args(&args)
+            .env(RANK, format!("{}", rank))
+            .env(WORLD_SIZE, format!("{}", nprocs))
+            .env(SHM_PATH, path)
+            .env(CAPACITY, format!("{}", capacity))
+            .spawn();
+        match spawned {
+            Ok(child) => children.push(child),
+            Err(e) => {
+                kill_all(&mut children);
+                return Err(e);
+            }
+        }
+    }
+    // poll rather than wait in order: once one worker is gone the rest
+    // can never get past the next collective
+    while !children.is_empty() {
+        let mut i = 0;
+        while i < children.len() {
+            match children[i].try_wait() {
+                Ok(Some(status)) => {
+                    children.swap_remove(i);
+                    if !status.success() {
+                        kill_all(&mut children);
+                        return Err(Error::new(ErrorKind::Other,
+                                              format!("worker exited with {}", status)));
+                    }
+                }
+                Ok(None) => i += 1,
+                Err(e) => {
+                    kill_all(&mut children);
+                    return Err(e);
+                }
+            }
+        }
+        thread::sleep(Duration::from_millis(50));
+    }
+    Ok(())
+}
+
+/// Re-execute the current binary (with the same arguments) as `nprocs`
+/// local workers sharing one shared memory segment, and wait for all of
+/// them to exit.  Workers pick up their rank with `init_process_group`.
+/// If any worker fails the others are killed; the segment is removed
+/// either way.
+pub fn launch(nprocs: usize, capacity: usize) -> io::Result<()> {
+    let path = shm_path(&format!("{}", ::std::process::id()));
+    ProcessGroup::create(&path, nprocs, capacity)?;
+    let result = run_workers(&path, nprocs, capacity);
+    let removed = remove_shm(&path);
+    result.and(removed)
+}
+
+/// Join the process group set up by `launch` for this worker.
+pub fn init_process_group() -> io::Result<ProcessGroup> {
+    let path = env::var(SHM_PATH).map_err(|_| Error::new(ErrorKind::NotFound, SHM_PATH))?;
+    ProcessGroup::open(path,
+                       env_usize(RANK)?,
+                       env_usize(WORLD_SIZE)?,
+                       env_usize(CAPACITY)?)
+}
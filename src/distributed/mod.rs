@@ -0,0 +1,5 @@
+pub mod process_group;
+pub mod launch;
+
+pub use self::process_group::*;
+pub use self::launch::*;
@@ -0,0 +1,180 @@
+use std::fs::{self, OpenOptions};
+use std::path::{Path, PathBuf};
+use std::sync::atomic::{AtomicUsize, Ordering};
+use std::{io, mem, ptr, slice, thread};
+use std::time::Duration;
+use memmap::{Mmap, Protection};
+use tensor::NumLimits;
+
+// control block at the head of the shared segment (barrier count,
+// barrier generation, abort flag), padded out to a cache line so the
+// counters don't share a line with rank 0's slot
+const HEADER_SIZE: usize = 64;
+// yields in `barrier` before falling back to sleeping
+const SPIN_LIMIT: usize = 1000;
+
+/// A group of local worker processes that communicate through a single
+/// memory mapped file (normally under /dev/shm).  The segment holds a
+/// barrier followed by one staging slot per rank and a result slot, each
+/// `capacity` bytes long.
+pub struct ProcessGroup {
+    pub rank: usize,
+    pub world_size: usize,
+    capacity: usize,
+    shm: Mmap,
+}
+
+fn segment_size(world_size: usize, capacity: usize) -> usize {
+    HEADER_SIZE + (world_size + 1) * capacity
+}
+
+impl ProcessGroup {
+    /// Create (or truncate) the zero filled backing file for a group.
+    /// This has to happen exactly once, before any rank calls `open`.
+    pub fn create<P>(path: P, world_size: usize, capacity: usize) -> io::Result<()>
+        where P: AsRef<Path>
+    {
+        let file = OpenOptions::new()
+            .read(true)
+            .write(true)
+            .create(true)
+            .truncate(true)
+            .open(path)?;
+        file.set_len(segment_size(world_size, capacity) as u64)
+    }
+    pub fn open<P>(path: P, rank: usize, world_size: usize, capacity: usize) -> io::Result<Self>
+        where P: AsRef<Path>
+    {
+        assert!(rank < world_size, "rank {} out of range {}", rank, world_size);
+        let shm = Mmap::open_path(path, Protection::ReadWrite)?;
+        if shm.len() < segment_size(world_size, capacity) {
+            return Err(io::Error::new(io::ErrorKind::InvalidData,
+                                      "shared memory segment too small for group"));
+        }
+        Ok(ProcessGroup {
+               rank: rank,
+               world_size: world_size,
+               capacity: capacity,
+               shm: shm,
+           })
+    }
+    fn counter(&self, idx: usize) -> &AtomicUsize {
+        let offset = idx * mem::size_of::<usize>();
+        unsafe { &*(self.shm.ptr().offset(offset as isize) as *const AtomicUsize) }
+    }
+    fn slot<T>(&self, idx: usize) -> *mut T {
+        let offset = HEADER_SIZE + idx * self.capacity;
+        unsafe { self.shm.ptr().offset(offset as isize) as *mut T }
+    }
+    /// Sense reversing barrier across all ranks in the group.  Panics
+    /// once any rank has called `abort`, rather than waiting forever on
+    /// a peer that is gone.
+    pub fn barrier(&self) {
+        let (arrived, generation) = (self.counter(0), self.counter(1));
+        let gen = generation.load(Ordering::Acquire);
+        self.check_aborted();
+        if arrived.fetch_add(1, Ordering::AcqRel) + 1 == self.world_size {
+            arrived.store(0, Ordering::Relaxed);
+            generation.fetch_add(1, Ordering::Release);
+        } else {
+            let mut spins = 0;
+            while generation.load(Ordering::Acquire) == gen {
+                self.check_aborted();
+                // peers normally arrive within a few yields; one that is
+                // off doing something else (rank 0 running the test set)
+                // shouldn't keep the rest spinning on a core each
+                if spins < SPIN_LIMIT {
+                    spins += 1;
+                    thread::yield_now();
+                } else {
+                    thread::sleep(Duration::new(0, 50000));
+                }
+            }
+        }
+    }
+    /// Mark the group as failed; every rank blocked in (or later
+    /// entering) `barrier` panics instead of hanging.
+    pub fn abort(&self) {
+        self.counter(2).store(1, Ordering::Release);
+    }
+    pub fn is_aborted(&self) -> bool {
+        self.counter(2).load(Ordering::Acquire) != 0
+    }
+    fn check_aborted(&self) {
+        if self.is_aborted() {
+            panic!("process group aborted, rank {} giving up", self.rank);
+        }
+    }
+    /// Number of elements of type T that fit in a single exchange.
+    pub fn bucket_len<T>(&self) -> usize {
+        self.capacity / mem::size_of::<T>()
+    }
+    /// Sum `data` element-wise across all ranks, in place.
+    ///
+    /// Each chunk is reduce-scattered (rank r sums the r'th segment of
+    /// every staging slot into the result slot) and then all-gathered,
+    /// so the reduction work is split evenly over the group.
+    pub fn all_reduce<T: NumLimits>(&mut self, data: &mut [T]) {
+        let bucket_len = self.bucket_len::<T>();
+        assert!(bucket_len > 0, "process group capacity too small");
+        for chunk in data.chunks_mut(bucket_len) {
+            let (rank, world_size, n) = (self.rank, self.world_size, chunk.len());
+            unsafe { ptr::copy_nonoverlapping(chunk.as_ptr(), self.slot::<T>(rank), n) };
+            self.barrier();
+            let (start, end) = (rank * n / world_size, (rank + 1) * n / world_size);
+            let result = self.slot::<T>(world_size);
+            for i in start..end {
+                let mut acc = T::zero();
+                for r in 0..world_size {
+                    acc = acc + unsafe { *self.slot::<T>(r).offset(i as isize) };
+                }
+                unsafe { *result.offset(i as isize) = acc };
+            }
+            self.barrier();
+            unsafe { ptr::copy_nonoverlapping(result, chunk.as_mut_ptr(), n) };
+            // don't let a fast rank overwrite its slot for the next chunk
+            // before everyone has read the result
+            self.barrier();
+        }
+    }
+    /// Overwrite `data` on every rank with the contents from `root`.
+    pub fn broadcast<T: NumLimits>(&mut self, data: &mut [T], root: usize) {
+        let bucket_len = self.bucket_len::<T>();
+        assert!(bucket_len > 0, "process group capacity too small");
+        for chunk in data.chunks_mut(bucket_len) {
+            let (n, result) = (chunk.len(), self.slot::<T>(self.world_size));
+            if self.rank == root {
+                unsafe { ptr::copy_nonoverlapping(chunk.as_ptr(), result, n) };
+            }
+            self.barrier();
+            if self.rank != root {
+                let src = unsafe { slice::from_raw_parts(result as *const T, n) };
+                chunk.copy_from_slice(src);
+            }
+            self.barrier();
+        }
+    }
+}
+
+impl Drop for ProcessGroup {
+    fn drop(&mut self) {
+        // a rank unwinding out of a collective will never reach the next
+        // barrier, so release the others
+        if thread::panicking() {
+            self.abort();
+        }
+    }
+}
+
+/// Default location of the shared segment for a group named `name`.
+pub fn shm_path(name: &str) -> PathBuf {
+    let dir = PathBuf::from("/dev/shm");
+    let dir = if dir.is_dir() { dir } else { ::std::env::temp_dir() };
+    dir.join(format!("torchrs-{}", name))
+}
+
+pub fn remove_shm<P>(path: P) -> io::Result<()>
+    where P: AsRef<Path>
+{
+    fs::remove_file(path)
+}
@@ -36,6 +36,7 @@ pub mod utils;
 pub mod tensor;
 pub mod storage;
 pub mod torch;
+pub mod distributed;
 
 #[cfg(test)]
 pub mod test;
@@ -3,9 +3,13 @@ pub mod modules;
 pub mod functional;
 pub mod _functions;
 pub mod backends;
+pub mod parallel;
+pub mod quantized;
 
 pub use self::modules::module::*;
 pub use self::modules::convolution::*;
 pub use self::modules::linear::*;
+pub use self::modules::arena::*;
 pub use self::parameter::*;
 pub use self::backends::*;
+pub use self::parallel::*;
@@ -0,0 +1,133 @@
+use std::io::{self, Error, ErrorKind};
+use std::path::Path;
+use std::{mem, slice};
+use memmap::{Mmap, Protection};
+use autograd::Variable;
+use nn::quantized;
+use tensor::{Tensor, NumLimits};
+use torch;
+
+static MAGIC: &[u8] = b"TRSARENA";
+static HEADER_SIZE: usize = 24;
+
+fn u64_bytes(v: u64) -> [u8; 8] {
+    let mut b = [0u8; 8];
+    for i in 0..8 {
+        b[i] = (v >> (8 * i)) as u8;
+    }
+    b
+}
+
+fn u64_from_bytes(b: &[u8]) -> u64 {
+    b.iter().take(8).enumerate().fold(0, |v, (i, byte)| v | (*byte as u64) << (8 * i))
+}
+
+/// Backing store for `ModIntf::flatten_parameters`: every parameter of
+/// a module tree that requires a gradient becomes a view into `params`
+/// and its gradient a view into `grads`, both flat contiguous buffers in
+/// `apply_parameters` order.  Zeroing, optimizer updates, all-reduce and
+/// checkpointing can then work on the two buffers in one go.  Frozen
+/// parameters are left out, so bulk updates never touch them.
+pub struct ParamArena<T: NumLimits> {
+    pub params: Tensor<T>,
+    pub grads: Tensor<T>,
+    vars: Vec<Variable<T>>,
+    grad_views: Vec<Tensor<T>>,
+}
+
+impl<T: NumLimits> ParamArena<T> {
+    pub fn new(mut vars: Vec<Variable<T>>) -> Self {
+        vars.retain(|v| v.requires_grad());
+        let numel: usize = vars.iter().map(|v| v.data_borrow().numel()).sum();
+        let params: Tensor<T> = torch::tensor(vec![numel]);
+        let grads: Tensor<T> = torch::zeros(vec![numel]);
+        let mut grad_views = Vec::with_capacity(vars.len());
+        let mut offset = 0;
+        for v in vars.iter_mut() {
+            let size = v.data_borrow().size();
+            let mut view = params.storage_view(offset, &size);
+            view.copy_(v.data_borrow());
+            *v.data() = view;
+            let grad = grads.storage_view(offset, &size);
+            if let Some(ref mut g) = *v.grad() {
+                grad.clone().copy_(g.data_borrow());
+            }
+            grad_views.push(grad);
+            offset += v.data_borrow().numel();
+        }
+        let mut arena = ParamArena {
+            params: params,
+            grads: grads,
+            vars: vars,
+            grad_views: grad_views,
+        };
+        arena.attach_grads();
+        arena
+    }
+    pub fn len(&self) -> usize {
+        self.params.numel()
+    }
+    // point every parameter's grad back at its slot in the arena
+    fn attach_grads(&mut self) {
+        for (v, grad) in self.vars.iter_mut().zip(self.grad_views.iter()) {
+            *v.grad() = Some(Variable::new(grad.clone()));
+        }
+    }
+    pub fn zero_grad(&mut self) {
+        self.grads.zero_();
+        self.attach_grads();
+    }
+    /// Whether every parameter's gradient is still its view into
+    /// `grads`.  Backward allocates a fresh gradient for a parameter
+    /// whose grad was cleared, and the arena never sees that one.
+    pub fn is_attached(&mut self) -> bool {
+        self.vars
+            .iter_mut()
+            .zip(self.grad_views.iter())
+            .all(|(v, view)| match *v.grad() {
+                     Some(ref g) => g.data_borrow().as_slice().as_ptr() == view.as_slice().as_ptr(),
+                     None => false,
+                 })
+    }
+    /// Write the flat parameter buffer as a raw checkpoint: a 24 byte
+    /// header (magic, element count, element size) then the elements.
+    /// The file is replaced atomically, see `torch::write_atomic`.
+    pub fn save<P>(&self, path: P) -> io::Result<()>
+        where P: AsRef<Path>
+    {
+        let (numel, size) = (self.len(), mem::size_of::<T>());
+        let mut buf = Vec::with_capacity(HEADER_SIZE + numel * size);
+        buf.extend_from_slice(MAGIC);
+        buf.extend_from_slice(&u64_bytes(numel as u64));
+        buf.extend_from_slice(&u64_bytes(size as u64));
+        let data = self.params.as_slice();
+        let bytes = unsafe { slice::from_raw_parts(data.as_ptr() as *const u8, numel * size) };
+        buf.extend_from_slice(bytes);
+        torch::write_atomic(path, buf.as_slice())
+    }
+    /// Map a checkpoint written by `save` and copy it straight into the
+    /// parameter buffer.
+    pub fn load<P>(&mut self, path: P) -> io::Result<()>
+        where P: AsRef<Path>
+    {
+        let fp = Mmap::open_path(path, Protection::Read)?;
+        let (numel, size) = (self.len(), mem::size_of::<T>());
+        let data = unsafe { fp.as_slice() };
+        if data.len() < HEADER_SIZE || &data[..8] != MAGIC {
+            return Err(Error::new(ErrorKind::InvalidData, "not an arena checkpoint"));
+        }
+        if u64_from_bytes(&data[8..16]) != numel as u64 ||
+           u64_from_bytes(&data[16..24]) != size as u64 ||
+           data.len() < HEADER_SIZE + numel * size {
+            return Err(Error::new(ErrorKind::InvalidData, "checkpoint doesn't match arena"));
+        }
+        let dst = self.params.as_mut_slice();
+        unsafe {
+            ::std::ptr::copy_nonoverlapping(data[HEADER_SIZE..].as_ptr(),
+                                            dst.as_mut_ptr() as *mut u8,
+                                            numel * size)
+        };
+        quantized::weights_changed();
+        Ok(())
+    }
+}
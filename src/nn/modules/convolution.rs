@@ -3,6 +3,7 @@ use autograd::Variable;
 use nn::_functions::Conv2dFArgs;
 use std::marker::PhantomData;
 use nn::functional as F;
+use nn::quantized::{self, PackedWeight};
 use tensor::NumLimits;
 
 #[builder(pattern="owned")]
@@ -39,6 +40,8 @@ pub struct Conv2d<T: NumLimits> {
     bias: Option<Parameter<T>>,
     #[ignore]
     args: Conv2dFArgs,
+    #[ignore]
+    packed: Option<PackedWeight>,
 }
 
 impl<T: NumLimits> Conv2d<T> {
@@ -86,15 +89,45 @@ impl<T: NumLimits> Conv2d<T> {
                                         args.kernel_size.1 as usize]),
                 bias: bias,
                 args: fargs,
+                packed: None,
             }
             .init_module()
             .reset_parameters()
     }
+    fn forward_quantized(&mut self, input: &Variable<T>, relu: bool) -> Option<Variable<T>> {
+        if self.delegate.training || !self.delegate._int8 {
+            return None;
+        }
+        let args = &self.args;
+        let weight = self.weight.v.data_borrow();
+        let bias = self.bias.as_ref().map(|bias| bias.v.data_borrow());
+        if let Some(ref mut packed) = self.packed {
+            // the float weights moved on since they were packed
+            if packed.generation != quantized::generation() {
+                *packed = PackedWeight::new(weight, bias, packed.input);
+            }
+            return Some(quantized::output(packed.conv2d(input.data_borrow(), args, relu)));
+        }
+        None
+    }
+    // F::relu(self.f(input)), fused into the int8 kernel when enabled
+    pub fn forward_relu(&mut self, input: Variable<T>) -> Variable<T> {
+        if let Some(output) = self.forward_quantized(&input, true) {
+            return output;
+        }
+        F::relu(self.f(input))
+    }
 }
 impl_mod_delegate!(Conv2d);
 
 impl<T: NumLimits> ModIntf<T> for Conv2d<T> {
     fn forward(&mut self, input: &mut Variable<T>) -> Variable<T> {
+        if let Some(ref mut observer) = self.delegate._observer {
+            observer.observe(input.data_borrow());
+        }
+        if let Some(output) = self.forward_quantized(input, false) {
+            return output;
+        }
         let bias = if let Some(ref mut biasp) = self.bias {
             Some(&mut biasp.v)
         } else {
@@ -102,4 +135,16 @@ impl<T: NumLimits> ModIntf<T> for Conv2d<T> {
         };
         F::conv2d(input, &mut self.weight.v, bias, &mut self.args)
     }
+    fn quantize(&mut self) {
+        // grouped convolutions stay in floating point
+        if self.args.groups != 1 {
+            return;
+        }
+        let qparams = match self.delegate._observer {
+            Some(ref observer) => observer.qparams(),
+            None => return,
+        };
+        let bias = self.bias.as_ref().map(|bias| bias.v.data_borrow());
+        self.packed = Some(PackedWeight::new(self.weight.v.data_borrow(), bias, qparams));
+    }
 }
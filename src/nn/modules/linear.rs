@@ -1,5 +1,6 @@
 use nn::{Module, InitModuleStruct, GetFieldStruct, ModDelegate, ModIntf, Parameter};
 use nn::functional as F;
+use nn::quantized::{self, PackedWeight};
 use autograd::Variable;
 use std::marker::PhantomData;
 use tensor::NumLimits;
@@ -30,6 +31,8 @@ pub struct Linear<T: NumLimits> {
     out_features: usize,
     weight: Parameter<T>,
     bias: Option<Parameter<T>>,
+    #[ignore]
+    packed: Option<PackedWeight>,
 }
 
 impl<T: NumLimits> Linear<T> {
@@ -58,15 +61,44 @@ impl<T: NumLimits> Linear<T> {
                 out_features: args.out_features,
                 weight: Parameter::new((args.out_features, args.in_features)),
                 bias: bias,
+                packed: None,
             }
             .init_module()
             .reset_parameters()
     }
+    fn forward_quantized(&mut self, input: &Variable<T>, relu: bool) -> Option<Variable<T>> {
+        if self.delegate.training || !self.delegate._int8 {
+            return None;
+        }
+        let weight = self.weight.v.data_borrow();
+        let bias = self.bias.as_ref().map(|bias| bias.v.data_borrow());
+        if let Some(ref mut packed) = self.packed {
+            // the float weights moved on since they were packed
+            if packed.generation != quantized::generation() {
+                *packed = PackedWeight::new(weight, bias, packed.input);
+            }
+            return Some(quantized::output(packed.linear(input.data_borrow(), relu)));
+        }
+        None
+    }
+    // F::relu(self.f(input)), fused into the int8 kernel when enabled
+    pub fn forward_relu(&mut self, input: Variable<T>) -> Variable<T> {
+        if let Some(output) = self.forward_quantized(&input, true) {
+            return output;
+        }
+        F::relu(self.f(input))
+    }
 }
 impl_mod_delegate!(Linear);
 
 impl<T: NumLimits> ModIntf<T> for Linear<T> {
     fn forward(&mut self, input: &mut Variable<T>) -> Variable<T> {
+        if let Some(ref mut observer) = self.delegate._observer {
+            observer.observe(input.data_borrow());
+        }
+        if let Some(output) = self.forward_quantized(input, false) {
+            return output;
+        }
         let bias = if let Some(ref mut bias) = self.bias {
             Some(&mut bias.v)
         } else {
@@ -74,4 +106,12 @@ impl<T: NumLimits> ModIntf<T> for Linear<T> {
         };
         F::linear(&input, &mut self.weight.v, bias)
     }
+    fn quantize(&mut self) {
+        let qparams = match self.delegate._observer {
+            Some(ref observer) => observer.qparams(),
+            None => return,
+        };
+        let bias = self.bias.as_ref().map(|bias| bias.v.data_borrow());
+        self.packed = Some(PackedWeight::new(self.weight.v.data_borrow(), bias, qparams));
+    }
 }
@@ -1,3 +1,4 @@
 pub mod module;
 pub mod linear;
 pub mod convolution;
+pub mod arena;
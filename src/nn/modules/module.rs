@@ -1,6 +1,8 @@
 use std::collections::HashMap;
 use tensor::{Tensor, NumLimits};
 use autograd::{Variable, VarId, VarAccess};
+use nn::quantized::MinMaxObserver;
+use nn::ParamArena;
 
 pub trait InitModuleStruct {
     fn init_module(self) -> Self;
@@ -19,6 +21,9 @@ pub struct Module<T: NumLimits> {
     _buffers: HashMap<String, Tensor<T>>,
     pub _params: Vec<&'static str>,
     pub _modules: Vec<&'static str>,
+    pub _observer: Option<MinMaxObserver>,
+    pub _int8: bool,
+    pub _arena: Option<ParamArena<T>>,
 }
 
 impl<T: NumLimits> Module<T> {
@@ -28,6 +33,9 @@ impl<T: NumLimits> Module<T> {
             _buffers: HashMap::new(),
             _params: Vec::new(),
             _modules: Vec::new(),
+            _observer: None,
+            _int8: false,
+            _arena: None,
             training: true,
         }
     }
@@ -96,12 +104,19 @@ pub trait ModIntf<T: NumLimits>: ModDelegate<T> + GetFieldStruct<T> {
         max
     }
     fn free_grad(&mut self) {
+        // a flattened model's gradients have to stay views into its
+        // arena, or the next backward allocates ones the arena never sees
+        if let Some(ref mut arena) = self.delegate()._arena {
+            arena.zero_grad();
+            return;
+        }
         self.apply_parameters(&mut |v| *v.access().grad() = None);
     }
     fn free_graph(&mut self) {
-        self.free_grad();
+        // reset first so that re-attached arena gradients stay in the table
         ::autograd::var_table_reset(self.max_id());
         ::autograd::func_table_reset();
+        self.free_grad();
     }
     fn apply_parameters(&mut self, func: &mut FnMut(&mut Variable<T>)) {
         let mod_names = self.delegate()._modules.clone();
@@ -113,6 +128,13 @@ pub trait ModIntf<T: NumLimits>: ModDelegate<T> + GetFieldStruct<T> {
             func(&mut param)
         }
     }
+    // opt in to keeping every parameter and gradient of the tree in a
+    // single ParamArena; optimizers then update it in bulk
+    fn flatten_parameters(&mut self) {
+        let mut vars = Vec::new();
+        self.apply_parameters(&mut |v| vars.push(v.clone()));
+        self.delegate()._arena = Some(ParamArena::new(vars));
+    }
     fn eval(&mut self) {
         self.delegate().training = false;
         let mod_names = self.delegate()._modules.clone();
@@ -121,6 +143,9 @@ pub trait ModIntf<T: NumLimits>: ModDelegate<T> + GetFieldStruct<T> {
             module.eval()
         }
     }
+    // pack int8 weights from the calibrated input range, see nn::quantized;
+    // modules without an int8 kernel stay in floating point
+    fn quantize(&mut self) {}
 }
 pub trait ModIntfV<T: NumLimits>: ModDelegate<T> {
     fn forwardv(&mut self, input: &mut Vec<Variable<T>>) -> Vec<Variable<T>>;
@@ -0,0 +1,161 @@
+use std::mem;
+use std::sync::mpsc::{channel, Sender, Receiver};
+use std::thread::{self, JoinHandle};
+use num::NumCast;
+use distributed::ProcessGroup;
+use nn::{ModIntf, ModDelegate};
+use nn::quantized;
+use tensor::{Tensor, NumLimits, THVec};
+use torch;
+
+fn flatten_into<T: NumLimits>(bucket: &mut Vec<T>, t: &Tensor<T>) {
+    let (start, n) = (bucket.len(), t.numel());
+    bucket.resize(start + n, T::zero());
+    t.get_storage(&mut bucket[start..], n);
+}
+
+fn unflatten<T: NumLimits>(t: &mut Tensor<T>, data: &[T]) {
+    let src: Tensor<T> = torch::tensor(THVec::new(t.size(), data.to_vec()));
+    t.copy_(&src);
+}
+
+/// Data parallel training across the local worker processes of a
+/// `ProcessGroup`.  Every worker holds a full replica of the model and
+/// trains on its own shard (see `DistributedSampler`); after `backward`
+/// `sync_gradients` replaces each gradient with its average over all
+/// replicas, so the subsequent `OptIntf::step` is identical everywhere.
+///
+/// Gradients are packed into buckets of at most one shared memory slot
+/// and handed to a communication thread as soon as each bucket fills.
+/// Only the packing and unpacking overlap with the all-reduce of the
+/// other buckets: autograd has no per-parameter gradient hooks, so no
+/// reduction starts before `backward` has returned, and the caller
+/// blocks in `sync_gradients` until the last bucket is back.
+pub struct DistributedDataParallel<T: NumLimits> {
+    pub rank: usize,
+    pub world_size: usize,
+    bucket_len: usize,
+    requests: Option<Sender<Vec<T>>>,
+    results: Receiver<Vec<T>>,
+    worker: Option<JoinHandle<ProcessGroup>>,
+}
+
+impl<T: NumLimits + Send + 'static> DistributedDataParallel<T> {
+    pub fn new(mut group: ProcessGroup, model: &mut ModIntf<T>) -> Self {
+        // start every replica from rank 0's weights
+        model.apply_parameters(&mut |p| {
+            let data = p.data();
+            let mut buf = Vec::new();
+            flatten_into(&mut buf, data);
+            group.broadcast(&mut buf, 0);
+            unflatten(data, &buf);
+        });
+        quantized::weights_changed();
+        let (rank, world_size, bucket_len) =
+            (group.rank, group.world_size, group.bucket_len::<T>());
+        let (req_tx, req_rx) = channel::<Vec<T>>();
+        let (res_tx, res_rx) = channel::<Vec<T>>();
+        let worker = thread::spawn(move || {
+            let scale: T = <T as NumCast>::from(group.world_size).unwrap();
+            for mut bucket in req_rx {
+                group.all_reduce(&mut bucket);
+                for v in bucket.iter_mut() {
+                    *v = *v / scale;
+                }
+                if res_tx.send(bucket).is_err() {
+                    break;
+                }
+            }
+            group
+        });
+        DistributedDataParallel {
+            rank: rank,
+            world_size: world_size,
+            bucket_len: bucket_len,
+            requests: Some(req_tx),
+            results: res_rx,
+            worker: Some(worker),
+        }
+    }
+    /// Average parameter gradients over all replicas.  Must be called by
+    /// every worker, between `backward` and `OptIntf::step`, with the
+    /// same set of parameters holding a gradient.
+    pub fn sync_gradients(&mut self, model: &mut ModIntf<T>) {
+        let arena_grads = match model.delegate()._arena {
+            Some(ref mut arena) => {
+                assert!(arena.is_attached(),
+                        "gradients detached from the parameter arena, call zero_grad or free_graph");
+                Some(arena.grads.clone())
+            }
+            None => None,
+        };
+        if let Some(mut flat) = arena_grads {
+            self.sync_flat(flat.as_mut_slice());
+            return;
+        }
+        let mut grads: Vec<Tensor<T>> = Vec::new();
+        model.apply_parameters(&mut |p| if let Some(ref mut g) = *p.grad() {
+                                        grads.push(g.data().clone())
+                                    });
+        let mut nbuckets = 0;
+        {
+            let requests = self.requests.as_ref().unwrap();
+            let mut bucket = Vec::with_capacity(self.bucket_len);
+            for g in &grads {
+                if !bucket.is_empty() && bucket.len() + g.numel() > self.bucket_len {
+                    let full = mem::replace(&mut bucket, Vec::with_capacity(self.bucket_len));
+                    requests.send(full).expect("communication thread exited");
+                    nbuckets += 1;
+                }
+                flatten_into(&mut bucket, g);
+            }
+            if !bucket.is_empty() {
+                requests.send(bucket).expect("communication thread exited");
+                nbuckets += 1;
+            }
+        }
+        // buckets come back in order, so walk the gradients alongside them
+        let mut grads = grads.iter_mut();
+        for _ in 0..nbuckets {
+            let reduced = self.results.recv().expect("communication thread exited");
+            let mut offset = 0;
+            while offset < reduced.len() {
+                let g = grads.next().unwrap();
+                let n = g.numel();
+                unflatten(g, &reduced[offset..offset + n]);
+                offset += n;
+            }
+        }
+    }
+    // a flattened model's gradients are already one contiguous bucket
+    // list, so they are sent and written back without any packing
+    fn sync_flat(&mut self, data: &mut [T]) {
+        let requests = self.requests.as_ref().unwrap();
+        for chunk in data.chunks(self.bucket_len) {
+            requests.send(chunk.to_vec()).expect("communication thread exited");
+        }
+        for chunk in data.chunks_mut(self.bucket_len) {
+            let reduced = self.results.recv().expect("communication thread exited");
+            chunk.copy_from_slice(reduced.as_slice());
+        }
+    }
+    /// Shut down the communication thread and hand back the group.
+    pub fn into_group(mut self) -> ProcessGroup {
+        self.requests.take();
+        self.worker
+            .take()
+            .unwrap()
+            .join()
+            .expect("communication thread panicked")
+    }
+}
+
+impl<T: NumLimits> Drop for DistributedDataParallel<T> {
+    fn drop(&mut self) {
+        // closing the channel ends the communication thread
+        self.requests.take();
+        if let Some(worker) = self.worker.take() {
+            let _ = worker.join();
+        }
+    }
+}
@@ -0,0 +1,3 @@
+pub mod distributed;
+
+pub use self::distributed::*;
@@ -0,0 +1,99 @@
+// Post-training int8 quantization for inference: `calibrate` records
+// the input range of each layer over a few batches, `convert` packs
+// per-channel int8 weights next to the float ones and `enable` switches
+// eval mode forward passes over to the int8 kernels.  Layers without an
+// int8 kernel keep running in floating point.
+//
+// The int8 kernels are not used by default: on a single core they only
+// beat TH's BLAS sgemm for the larger convolutions.
+
+pub mod observer;
+pub mod packed;
+
+pub use self::observer::*;
+pub use self::packed::*;
+
+use std::sync::atomic::{AtomicUsize, Ordering, ATOMIC_USIZE_INIT};
+
+use autograd::{Variable, VariableArgs, VarAccess};
+use nn::{ModIntf, ModDelegate};
+use tensor::{Tensor, NumLimits};
+use utils::data::BatchLoader;
+
+static WEIGHTS_GENERATION: AtomicUsize = ATOMIC_USIZE_INIT;
+
+/// Record that parameters were overwritten in place, so every packed
+/// weight is repacked before its next use.  Optimizer steps,
+/// `Checkpoint::restore`, `ParamArena::load` and the DDP broadcast call
+/// this; so must anything else writing to parameters after `convert`.
+pub fn weights_changed() {
+    WEIGHTS_GENERATION.fetch_add(1, Ordering::Relaxed);
+}
+
+pub fn generation() -> usize {
+    WEIGHTS_GENERATION.load(Ordering::Relaxed)
+}
+
+fn install_observer<T: NumLimits>(module: &mut ModIntf<T>) {
+    module.delegate()._observer = Some(MinMaxObserver::new());
+}
+
+fn convert_module<T: NumLimits>(module: &mut ModIntf<T>) {
+    module.quantize();
+    module.delegate()._observer = None;
+}
+
+fn enable_module<T: NumLimits>(module: &mut ModIntf<T>) {
+    module.delegate()._int8 = true;
+}
+
+fn disable_module<T: NumLimits>(module: &mut ModIntf<T>) {
+    module.delegate()._int8 = false;
+}
+
+/// Wrap the output of an int8 kernel; there is no backward through it.
+pub fn output<T: NumLimits>(t: Tensor<T>) -> Variable<T> {
+    let args = VariableArgs {
+        volatile: true,
+        ..Default::default()
+    };
+    Variable::new_args(t, &args)
+}
+
+/// Attach a fresh observer to every module in the tree.
+pub fn prepare<T: NumLimits>(model: &mut ModIntf<T>) {
+    model.apply(install_observer::<T>)
+}
+
+/// Collect activation ranges from up to `num_batches` batches of
+/// `loader`.  The model is left in eval mode.
+pub fn calibrate<T, Tt>(model: &mut ModIntf<T>, loader: &BatchLoader<T, Tt>, num_batches: usize)
+    where T: NumLimits + 'static + Default,
+          Tt: NumLimits + 'static + Default
+{
+    prepare(model);
+    model.eval();
+    let varargs = VariableArgs {
+        volatile: true,
+        ..Default::default()
+    };
+    for (ref data, _) in loader.iter().take(num_batches) {
+        model.f(Variable::new_args(data.clone(), &varargs));
+    }
+}
+
+/// Pack int8 weights for every module that supports it, using the
+/// ranges gathered by `calibrate`, and drop the observers.
+pub fn convert<T: NumLimits>(model: &mut ModIntf<T>) {
+    model.apply(convert_module::<T>)
+}
+
+/// Run converted modules through the int8 kernels in eval mode.
+pub fn enable<T: NumLimits>(model: &mut ModIntf<T>) {
+    model.apply(enable_module::<T>)
+}
+
+/// Go back to the float weights; the packed ones are kept.
+pub fn disable<T: NumLimits>(model: &mut ModIntf<T>) {
+    model.apply(disable_module::<T>)
+}
@@ -0,0 +1,61 @@
+use std::f32;
+use num::ToPrimitive;
+use tensor::{Tensor, NumLimits};
+
+/// Affine mapping between f32 and uint8: x = scale * (q - zero_point)
+#[derive(Clone, Copy, Debug)]
+pub struct QParams {
+    pub scale: f32,
+    pub zero_point: i32,
+}
+
+impl QParams {
+    /// Parameters covering [min, max].  The range is widened to include
+    /// 0 so that zero padding is represented exactly.
+    pub fn from_range(min: f32, max: f32) -> Self {
+        let (min, max) = (min.min(0.), max.max(0.));
+        let scale = if max > min { (max - min) / 255. } else { 1. };
+        let zero_point = (-min / scale).round() as i32;
+        QParams {
+            scale: scale,
+            zero_point: zero_point.max(0).min(255),
+        }
+    }
+    pub fn quantize_slice<T: NumLimits>(&self, src: &[T], dst: &mut Vec<u8>) {
+        let (inv_scale, zero_point) = (1. / self.scale, self.zero_point);
+        dst.extend(src.iter().map(|v| {
+            let q = (v.to_f32().unwrap() * inv_scale).round() as i32 + zero_point;
+            q.max(0).min(255) as u8
+        }));
+    }
+}
+
+/// Tracks the running min and max of the activations a layer sees
+/// during calibration.
+#[derive(Clone, Debug)]
+pub struct MinMaxObserver {
+    pub min: f32,
+    pub max: f32,
+}
+
+impl MinMaxObserver {
+    pub fn new() -> Self {
+        MinMaxObserver {
+            min: f32::INFINITY,
+            max: f32::NEG_INFINITY,
+        }
+    }
+    pub fn observe<T: NumLimits>(&mut self, t: &Tensor<T>) {
+        let (min, max) = (t.min().to_f32().unwrap(), t.max().to_f32().unwrap());
+        self.min = self.min.min(min);
+        self.max = self.max.max(max);
+    }
+    pub fn qparams(&self) -> QParams {
+        if self.min > self.max {
+            // never saw any input
+            QParams::from_range(0., 0.)
+        } else {
+            QParams::from_range(self.min, self.max)
+        }
+    }
+}
@@ -0,0 +1,199 @@
+use std::cmp;
+use num::{NumCast, ToPrimitive};
+use nn::_functions::Conv2dFArgs;
+use nn::quantized::QParams;
+use tensor::{Tensor, NumLimits, THVec};
+use torch;
+
+fn to_vec<T: NumLimits>(t: &Tensor<T>) -> Vec<T> {
+    /* XXX presupposes contiguity, as does get_storage */
+    let n = t.numel();
+    let mut v = vec![T::zero(); n];
+    t.get_storage(v.as_mut_slice(), n);
+    v
+}
+
+fn from_f32<T: NumLimits>(dims: Vec<usize>, data: Vec<f32>) -> Tensor<T> {
+    let data = data.into_iter()
+        .map(|v| <T as NumCast>::from(v).unwrap())
+        .collect();
+    torch::tensor(THVec::new(dims, data))
+}
+
+// register tile of the int8 GEMM: MR input rows by NR output channels
+const MR: usize = 4;
+const NR: usize = 2;
+
+// MR x NR block of dot products.  Each weight byte loaded is used MR
+// times and each input byte NR times, and the loop over k vectorizes
+// once the slices are cut to a common length.
+#[inline]
+fn kernel(x: &[&[u8]; MR], w: &[&[i8]; NR], k: usize) -> [[i32; NR]; MR] {
+    let x = [&x[0][..k], &x[1][..k], &x[2][..k], &x[3][..k]];
+    let w = [&w[0][..k], &w[1][..k]];
+    let mut acc = [[0i32; NR]; MR];
+    for kk in 0..k {
+        let v = [w[0][kk] as i32, w[1][kk] as i32];
+        for i in 0..MR {
+            let y = x[i][kk] as i32;
+            for n in 0..NR {
+                acc[i][n] += y * v[n];
+            }
+        }
+    }
+    acc
+}
+
+/// Int8 copy of a Linear weight matrix or Conv2d filter bank, kept next
+/// to the float parameters.  Each output channel (row) is quantized
+/// symmetrically with its own scale; row sums are kept so the input
+/// zero point can be folded out of the integer dot products.
+pub struct PackedWeight {
+    pub scales: Vec<f32>,
+    pub bias: Option<Vec<f32>>,
+    pub rows: usize,
+    pub cols: usize,
+    pub input: QParams,
+    pub data: Vec<i8>,
+    // nn::quantized::generation() when packed
+    pub generation: usize,
+    row_sums: Vec<i32>,
+}
+
+impl PackedWeight {
+    pub fn new<T: NumLimits>(weight: &Tensor<T>, bias: Option<&Tensor<T>>, input: QParams) -> Self {
+        let rows = weight.size()[0];
+        let cols = weight.numel() / rows;
+        let (mut data, mut scales, mut row_sums) =
+            (Vec::with_capacity(rows * cols), Vec::with_capacity(rows), Vec::with_capacity(rows));
+        let weight = to_vec(weight);
+        let w: Vec<f32> = weight.iter().map(|v| v.to_f32().unwrap()).collect();
+        for row in w.chunks(cols) {
+            let absmax = row.iter().fold(0f32, |m, v| m.max(v.abs()));
+            let scale = if absmax > 0. { absmax / 127. } else { 1. };
+            let mut sum = 0;
+            for v in row {
+                let q = (v / scale).round().max(-127.).min(127.) as i8;
+                sum += q as i32;
+                data.push(q);
+            }
+            scales.push(scale);
+            row_sums.push(sum);
+        }
+        let bias = bias.map(|b| to_vec(b).iter().map(|v| v.to_f32().unwrap()).collect());
+        PackedWeight {
+            scales: scales,
+            bias: bias,
+            rows: rows,
+            cols: cols,
+            input: input,
+            data: data,
+            generation: super::generation(),
+            row_sums: row_sums,
+        }
+    }
+    // Requantization of the i32 accumulator, the bias add and the
+    // optional ReLU, fused into the GEMM epilogue.
+    #[inline]
+    fn requantize(&self, acc: i32, n: usize, relu: bool) -> f32 {
+        let acc = acc - self.input.zero_point * self.row_sums[n];
+        let mut y = acc as f32 * self.input.scale * self.scales[n];
+        if let Some(ref bias) = self.bias {
+            y += bias[n];
+        }
+        if relu && y < 0. {
+            y = 0.;
+        }
+        y
+    }
+    // Multiply the m quantized input rows in x by every weight row,
+    // writing row i, output channel n to out[i * row_stride + n * col_stride].
+    // Short tiles at the edges repeat their last row; those results are
+    // dropped.
+    fn gemm(&self, x: &[u8], m: usize, relu: bool, out: &mut [f32], row_stride: usize, col_stride: usize) {
+        let k = self.cols;
+        let mut i0 = 0;
+        while i0 < m {
+            let mi = cmp::min(MR, m - i0);
+            let mut xs: [&[u8]; MR] = [&[]; MR];
+            for i in 0..MR {
+                let r = i0 + cmp::min(i, mi - 1);
+                xs[i] = &x[r * k..(r + 1) * k];
+            }
+            let mut n0 = 0;
+            while n0 < self.rows {
+                let ni = cmp::min(NR, self.rows - n0);
+                let mut ws: [&[i8]; NR] = [&[]; NR];
+                for n in 0..NR {
+                    let r = n0 + cmp::min(n, ni - 1);
+                    ws[n] = &self.data[r * k..(r + 1) * k];
+                }
+                let acc = kernel(&xs, &ws, k);
+                for i in 0..mi {
+                    for n in 0..ni {
+                        out[(i0 + i) * row_stride + (n0 + n) * col_stride] =
+                            self.requantize(acc[i][n], n0 + n, relu);
+                    }
+                }
+                n0 += NR;
+            }
+            i0 += MR;
+        }
+    }
+    /// Int8 equivalent of `F::linear` (followed by `F::relu` if `relu`)
+    /// for a contiguous [N x in_features] input.
+    pub fn linear<T: NumLimits>(&self, input: &Tensor<T>, relu: bool) -> Tensor<T> {
+        let batch = input.size()[0];
+        assert_eq!(input.numel(), batch * self.cols);
+        let mut x = Vec::with_capacity(input.numel());
+        self.input.quantize_slice(input.as_slice(), &mut x);
+        let mut out = vec![0f32; batch * self.rows];
+        self.gemm(x.as_slice(), batch, relu, out.as_mut_slice(), self.rows, 1);
+        from_f32(vec![batch, self.rows], out)
+    }
+    /// Int8 equivalent of `F::conv2d` (followed by `F::relu` if `relu`)
+    /// for a contiguous [N x C x H x W] input and groups == 1.  Each
+    /// quantized image is unfolded into an [OH * OW x C * KH * KW]
+    /// matrix and multiplied in one GEMM; out of bounds taps take the
+    /// zero point, i.e. 0.0.
+    pub fn conv2d<T: NumLimits>(&self, input: &Tensor<T>, args: &Conv2dFArgs, relu: bool) -> Tensor<T> {
+        let size = input.size();
+        let (batch, c, h, w) = (size[0], size[1], size[2], size[3]);
+        let (kh, kw) = (args.kernel_size[0] as usize, args.kernel_size[1] as usize);
+        let (sh, sw) = (args.stride[0] as usize, args.stride[1] as usize);
+        let (ph, pw) = (args.padding[0] as isize, args.padding[1] as isize);
+        let (dh, dw) = (args.dilation[0] as usize, args.dilation[1] as usize);
+        assert_eq!(c * kh * kw, self.cols);
+        let oh = (h + 2 * ph as usize - dh * (kh - 1) - 1) / sh + 1;
+        let ow = (w + 2 * pw as usize - dw * (kw - 1) - 1) / sw + 1;
+        let npix = oh * ow;
+
+        let mut x = Vec::with_capacity(input.numel());
+        self.input.quantize_slice(input.as_slice(), &mut x);
+        let pad = self.input.zero_point as u8;
+        let mut cols = vec![pad; npix * self.cols];
+        let mut out = vec![0f32; batch * self.rows * npix];
+        for (img, out_img) in x.chunks(c * h * w).zip(out.chunks_mut(self.rows * npix)) {
+            for (pix, col) in cols.chunks_mut(self.cols).enumerate() {
+                let (oy, ox) = (pix / ow, pix % ow);
+                let mut k = 0;
+                for plane in img.chunks(h * w) {
+                    for ky in 0..kh {
+                        let iy = (oy * sh + ky * dh) as isize - ph;
+                        for kx in 0..kw {
+                            let ix = (ox * sw + kx * dw) as isize - pw;
+                            col[k] = if iy >= 0 && iy < h as isize && ix >= 0 && ix < w as isize {
+                                plane[iy as usize * w + ix as usize]
+                            } else {
+                                pad
+                            };
+                            k += 1;
+                        }
+                    }
+                }
+            }
+            self.gemm(cols.as_slice(), npix, relu, out_img, 1, npix);
+        }
+        from_f32(vec![batch, self.rows, oh, ow], out)
+    }
+}
@@ -1,12 +1,14 @@
 pub use std::collections::HashMap;
 pub use autograd::{Variable, VarId};
-pub use nn::ModIntf;
+pub use nn::{ModIntf, ModDelegate};
 use utils::unsafe_lib::MutMap;
 use utils::TRVal;
 
 pub struct Optimizer {
     pub defaults: HashMap<&'static str, TRVal>,
     pub state: MutMap<VarId, ParamState>,
+    // state for a model's flattened ParamArena as a whole
+    pub arena_state: ParamState,
 }
 
 pub type ParamState = HashMap<&'static str, TRVal>;
@@ -16,6 +18,7 @@ impl Optimizer {
         Optimizer {
             defaults: defaults,
             state: MutMap::new(),
+            arena_state: HashMap::new(),
         }
     }
 }
@@ -23,6 +26,10 @@ impl Optimizer {
 pub trait OptIntf<T: ::tensor::NumLimits + From<TRVal>> {
     fn optimizer(&mut self) -> &mut Optimizer;
     fn zero_grad(&mut self, model: &mut ModIntf<T>) {
+        if let Some(ref mut arena) = model.delegate()._arena {
+            arena.zero_grad();
+            return;
+        }
         // XXX figure out point of parameter groups
         model.apply_parameters(&mut |p| if p.requires_grad() {
                                         // :-/
@@ -26,24 +26,21 @@ impl<T: ::tensor::NumLimits + From<TRVal> + Neg<Output = T>> OptIntf<T> for SGD
         &mut self.optimizer
     }
     fn step(&mut self, model: &mut ModIntf<T>) {
-        let (group, states) = (&self.optimizer.defaults, &mut self.optimizer.state);
+        let (group, states, arena_state) = (&self.optimizer.defaults,
+                                            &mut self.optimizer.state,
+                                            &mut self.optimizer.arena_state);
         let weight_decay: T = group["weight_decay"].clone().into();
         let momentum: T = group["momentum"].clone().into();
         let dampening: T = group["dampening"].clone().into();
         let nesterov: bool = group["nesterov"].clone().into();
         let lr: T = group["lr"].clone().into();
+        ::nn::quantized::weights_changed();
 
-        model.apply_parameters(&mut |v| {
-            let mut d_p = if let Some(ref mut grad) = *v.grad() {
-                grad.data().clone() as Tensor<T>
-            } else {
-                return;
-            };
+        let update = |data: &mut Tensor<T>, mut d_p: Tensor<T>, state: &mut ParamState| {
             if !weight_decay.is_zero() {
-                d_p.addt_(weight_decay, v.data());
+                d_p.addt_(weight_decay, data);
             }
             if !momentum.is_zero() {
-                let mut state = &mut states[v.id];
                 let mut buf: Tensor<T>;
                 if !state.contains_key("momentum_buffer") {
                     buf = d_p.copy();
@@ -59,7 +56,24 @@ impl<T: ::tensor::NumLimits + From<TRVal> + Neg<Output = T>> OptIntf<T> for SGD
                 }
 
             }
-            v.data().addt_(-lr, &d_p);
+            data.addt_(-lr, &d_p);
+        };
+
+        // a flattened model takes a single step over the whole arena
+        if let Some(ref mut arena) = model.delegate()._arena {
+            assert!(arena.is_attached(),
+                    "gradients detached from the parameter arena, call zero_grad or free_graph");
+            let d_p = arena.grads.clone();
+            update(&mut arena.params, d_p, arena_state);
+            return;
+        }
+        model.apply_parameters(&mut |v| {
+            let d_p = if let Some(ref mut grad) = *v.grad() {
+                grad.data().clone() as Tensor<T>
+            } else {
+                return;
+            };
+            update(v.data(), d_p, &mut states[v.id]);
         });
     }
 }
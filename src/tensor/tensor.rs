@@ -358,6 +358,21 @@ impl<T: NumLimits> Tensor<T> {
     pub fn set_storage(&mut self, args: Vec<T>) {
         self.value.borrow_mut().set_storage(args.as_slice());
     }
+    // as_slice and as_mut_slice presuppose contiguity
+    pub fn as_slice(&self) -> &[T] {
+        let p = self.value.borrow().data_ptr();
+        unsafe { ::std::slice::from_raw_parts(p, self.numel()) }
+    }
+    pub fn as_mut_slice(&mut self) -> &mut [T] {
+        let p = self.value.borrow().data_ptr();
+        unsafe { ::std::slice::from_raw_parts_mut(p, self.numel()) }
+    }
+    // tensor of shape dims sharing our storage, starting offset elements in
+    pub fn storage_view<D>(&self, offset: usize, dims: D) -> Self
+        where D: AsRef<[usize]>
+    {
+        self.value.borrow().storage_view(offset, dims.as_ref())
+    }
 }
 
 impl<T: NumLimits> Default for Tensor<T> {
@@ -424,6 +439,7 @@ pub trait TensorImpl<T: NumLimits>: Index<Ix, Output = T> + IndexMut<Ix> {
     fn cosh(&mut self, src: *mut c_void);
     fn cross(&mut self, src: *mut c_void, dim: Option<i32>);
     fn chunk(&self, n_chunks: usize, dim: usize) -> Vec<Tensor<T>>;
+    fn data_ptr(&self) -> *mut T;
     fn diag(&mut self, src: *mut c_void, diag: u32);
     fn dim(&self) -> i32;
     fn dist(&self, src: *mut c_void, p: u32) -> f64;
@@ -501,6 +517,7 @@ pub trait TensorImpl<T: NumLimits>: Index<Ix, Output = T> + IndexMut<Ix> {
     fn sort(&self, dim: Option<i32>, descending: bool, t: *mut c_void, i: *mut c_void);
     fn sqrt(&mut self, src: *mut c_void);
     fn std(&self) -> f64;
+    fn storage_view(&self, offset: usize, dims: &[usize]) -> Tensor<T>;
     fn stride(&self) -> Vec<i32>;
     fn sub(&mut self, src: *mut c_void, rhs: *mut c_void);
     fn squeeze(&mut self, dim: Option<usize>);
@@ -808,6 +825,10 @@ macro_rules! impl_tensor_impl {
             fn chunk(&self, n_chunks: usize, dim: usize) -> Vec<Tensor<$type>> {
                 unimplemented!()
             }
+            fn data_ptr(&self) -> *mut $type {
+                let offset = self.storage_offset() as isize;
+                unsafe {(*(*self.t).storage).data.offset(offset)}
+            }
             fn diag(&mut self, src: *mut c_void, diag: u32) {
                 unimplemented!()
             }
@@ -872,7 +893,8 @@ macro_rules! impl_tensor_impl {
                 self.resize(size.as_slice());
                 let s = rt.storage.as_ptr() as *const c_void;
                 let d = (unsafe { ((*(*self.t).storage).data) }) as *mut c_void;
-                unsafe {memcpy(d, s, rt.storage.len()) };
+                let n = rt.storage.len() * ::std::mem::size_of::<$type>();
+                unsafe {memcpy(d, s, n) };
             }
             fn gather(&mut self, src: *mut c_void, dim: i32, index: *mut c_void) {
                 unimplemented!()
@@ -892,7 +914,8 @@ macro_rules! impl_tensor_impl {
                 let s = unsafe {(*(*self.t).storage).data.offset(offset)};
                 let s = s as *const c_void;
                 let d = data.as_mut_ptr() as *mut c_void;
-                unsafe {memcpy(d, s, data.len()) };
+                let n = data.len() * ::std::mem::size_of::<$type>();
+                unsafe {memcpy(d, s, n) };
             }
             fn gt_tensor(&self, other: *mut c_void, out: *mut c_void) {
                 unimplemented!()
@@ -972,7 +995,7 @@ macro_rules! impl_tensor_impl {
                 unimplemented!()
             }
             fn max(&self) -> $type {
-                unimplemented!()
+                unsafe { concat_idents!($thname, _maxall)(self.t) }
             }
             fn max_reduce(&self,
                           values: *mut c_void,
@@ -996,7 +1019,7 @@ macro_rules! impl_tensor_impl {
                 unimplemented!()
             }
             fn min(&self) -> $type {
-                unimplemented!()
+                unsafe { concat_idents!($thname, _minall)(self.t) }
             }
             fn min_reduce(&self,
                           values: *mut c_void,
@@ -1165,6 +1188,19 @@ macro_rules! impl_tensor_impl {
             fn std(&self) -> f64 {
                 unimplemented!()
             }
+            fn storage_view(&self, offset: usize, dims: &[usize]) -> Tensor<$type> {
+                let dims_long : Vec<i64> = dims.iter().map(|t| *t as i64).collect();
+                let sizes = LongStorage::with_data(dims_long.as_slice());
+                let offset = (self.storage_offset() + offset) as isize;
+                let t = unsafe {
+                    concat_idents!($thname, _newWithStorage)((*self.t).storage,
+                                                             offset,
+                                                             sizes.t,
+                                                             std::ptr::null_mut())
+                };
+                let t = $name :: from_parts(t);
+                Tensor {value: RcMutNew(t) }
+            }
             fn stride(&self) -> Vec<i32> {
                 unimplemented!()
             }
@@ -0,0 +1,81 @@
+use std::env;
+use std::fs;
+use autograd::Variable;
+use nn::{self, ModIntf, ModDelegate, ParamArena};
+use optim::{self, OptIntf};
+use tensor::{Tensor, THVec};
+use torch;
+
+fn ramp(dims: Vec<usize>, scale: f32) -> Tensor<f32> {
+    let n = dims.iter().product();
+    torch::tensor(THVec::new(dims, (0..n).map(|i| ((i * 7 % 11) as f32 - 5.) * scale).collect()))
+}
+
+// a few SGD steps with momentum and weight decay on the same model and
+// data, returning the final parameters
+fn train(flatten: bool) -> Vec<Vec<f32>> {
+    let mut fc = nn::Linear::<f32>::build(6, 3).done();
+    fc.apply_parameters(&mut |v| {
+                            let size = v.data_borrow().size();
+                            *v.data() = ramp(size, 0.1);
+                        });
+    if flatten {
+        fc.flatten_parameters();
+    }
+    let mut optimizer = optim::SGD::new(map_opt!{"lr" => 0.1, "momentum" => 0.9,
+                                                 "weight_decay" => 0.01});
+    let x = Variable::new(ramp(vec![4, 6], 0.2));
+    for step in 0..3 {
+        // later steps rely on free_graph alone to reset the gradients
+        if step == 0 {
+            optimizer.zero_grad(&mut fc);
+        }
+        let mut out = fc.f(x.clone());
+        out.backward_args(Some(&mut ramp(vec![4, 3], 0.3)), false);
+        optimizer.step(&mut fc);
+        fc.free_graph();
+    }
+    let mut params = Vec::new();
+    fc.apply_parameters(&mut |v| params.push(v.data_borrow().as_slice().to_vec()));
+    params
+}
+
+#[test]
+fn arena_step_matches_per_parameter_step() {
+    let (expected, actual) = (train(false), train(true));
+    assert_eq!(expected.len(), actual.len());
+    for (e, a) in expected.iter().zip(actual.iter()) {
+        for (x, y) in e.iter().zip(a.iter()) {
+            assert!((x - y).abs() < 1e-5, "{} vs {}", x, y);
+        }
+    }
+}
+
+fn flattened(in_features: usize, out_features: usize) -> nn::Linear<f32> {
+    let mut fc = nn::Linear::<f32>::build(in_features, out_features).done();
+    fc.flatten_parameters();
+    fc
+}
+
+fn arena(fc: &mut nn::Linear<f32>) -> &mut ParamArena<f32> {
+    fc.delegate()._arena.as_mut().unwrap()
+}
+
+#[test]
+fn arena_save_load_round_trip() {
+    let path = env::temp_dir().join(format!("torchrs-arena-{}", ::std::process::id()));
+    let mut fc = flattened(6, 3);
+    arena(&mut fc).save(&path).unwrap();
+
+    let mut restored = flattened(6, 3);
+    arena(&mut restored).load(&path).unwrap();
+    let mut wider = flattened(6, 4);
+    let before = arena(&mut wider).params.as_slice().to_vec();
+    let result = arena(&mut wider).load(&path);
+    fs::remove_file(&path).unwrap();
+
+    assert_eq!(arena(&mut fc).params.as_slice(),
+               arena(&mut restored).params.as_slice());
+    assert!(result.is_err());
+    assert_eq!(before.as_slice(), arena(&mut wider).params.as_slice());
+}
@@ -0,0 +1,113 @@
+use std::env;
+use std::fs;
+use autograd::Variable;
+use nn::{self, ModIntf};
+use optim::{self, OptIntf};
+use tensor::{Tensor, THVec};
+use torch::{self, Checkpoint, load_checkpoint};
+
+fn ramp(dims: Vec<usize>, scale: f32) -> Tensor<f32> {
+    let n = dims.iter().product();
+    torch::tensor(THVec::new(dims, (0..n).map(|i| ((i * 7 % 11) as f32 - 5.) * scale).collect()))
+}
+
+fn sgd() -> optim::SGD {
+    optim::SGD::new(map_opt!{"lr" => 0.1, "momentum" => 0.9})
+}
+
+// a model and optimizer with momentum buffers, after two SGD steps
+fn trained(flatten: bool) -> (nn::Linear<f32>, optim::SGD) {
+    let mut fc = nn::Linear::<f32>::build(6, 3).done();
+    if flatten {
+        fc.flatten_parameters();
+    }
+    let mut optimizer = sgd();
+    let x = Variable::new(ramp(vec![4, 6], 0.2));
+    for _ in 0..2 {
+        optimizer.zero_grad(&mut fc);
+        let mut out = fc.f(x.clone());
+        out.backward_args(Some(&mut ramp(vec![4, 3], 0.3)), false);
+        optimizer.step(&mut fc);
+        fc.free_graph();
+    }
+    (fc, optimizer)
+}
+
+fn params(model: &mut ModIntf<f32>) -> Vec<Vec<f32>> {
+    let mut params = Vec::new();
+    model.apply_parameters(&mut |v| params.push(v.data_borrow().as_slice().to_vec()));
+    params
+}
+
+// every momentum buffer, per parameter in apply_parameters order, then
+// the arena's
+fn momentum(model: &mut ModIntf<f32>, optimizer: &mut optim::SGD) -> Vec<Vec<f32>> {
+    let optimizer = OptIntf::<f32>::optimizer(optimizer);
+    let mut buffers = Vec::new();
+    model.apply_parameters(&mut |v| {
+        let state = &mut optimizer.state[v.id];
+        if let Some(buf) = state.get("momentum_buffer") {
+            let buf: Tensor<f32> = buf.clone().into();
+            buffers.push(buf.as_slice().to_vec());
+        }
+    });
+    if let Some(buf) = optimizer.arena_state.get("momentum_buffer") {
+        let buf: Tensor<f32> = buf.clone().into();
+        buffers.push(buf.as_slice().to_vec());
+    }
+    buffers
+}
+
+fn round_trip(flatten: bool) {
+    let (mut fc, mut optimizer) = trained(flatten);
+    let path = env::temp_dir().join(format!("torchrs-checkpoint-{}-{}", flatten, ::std::process::id()));
+    Checkpoint::<f32>::new(&mut fc, &mut optimizer).save(&path).unwrap();
+    let checkpoint = load_checkpoint::<_, f32>(&path).unwrap();
+    fs::remove_file(&path).unwrap();
+
+    let mut restored = nn::Linear::<f32>::build(6, 3).done();
+    if flatten {
+        restored.flatten_parameters();
+    }
+    let mut restored_optimizer = sgd();
+    checkpoint.restore(&mut restored, &mut restored_optimizer).unwrap();
+    assert_eq!(params(&mut fc), params(&mut restored));
+    let expected = momentum(&mut fc, &mut optimizer);
+    assert_eq!(expected.len(), if flatten { 1 } else { 2 });
+    assert_eq!(expected, momentum(&mut restored, &mut restored_optimizer));
+}
+
+#[test]
+fn checkpoint_round_trip() {
+    round_trip(false);
+}
+
+#[test]
+fn checkpoint_round_trip_arena() {
+    round_trip(true);
+}
+
+#[test]
+fn checkpoint_rejects_unknown_state() {
+    let (mut fc, mut optimizer) = trained(false);
+    let mut checkpoint = Checkpoint::<f32>::new(&mut fc, &mut optimizer);
+    checkpoint.state[0].key = "exp_avg".to_string();
+    let mut restored = nn::Linear::<f32>::build(6, 3).done();
+    assert!(checkpoint.restore(&mut restored, &mut sgd()).is_err());
+}
+
+#[test]
+fn checkpoint_rejects_arena_mismatch() {
+    let (mut fc, mut optimizer) = trained(true);
+    let checkpoint = Checkpoint::<f32>::new(&mut fc, &mut optimizer);
+    let mut restored = nn::Linear::<f32>::build(6, 3).done();
+    let before = params(&mut restored);
+    assert!(checkpoint.restore(&mut restored, &mut sgd()).is_err());
+    assert_eq!(before, params(&mut restored));
+
+    let (mut fc, mut optimizer) = trained(false);
+    let checkpoint = Checkpoint::<f32>::new(&mut fc, &mut optimizer);
+    let mut restored = nn::Linear::<f32>::build(6, 3).done();
+    restored.flatten_parameters();
+    assert!(checkpoint.restore(&mut restored, &mut sgd()).is_err());
+}
@@ -0,0 +1,183 @@
+use std::collections::HashSet;
+use std::thread;
+use autograd::Variable;
+use distributed::{ProcessGroup, shm_path, remove_shm};
+use nn::{self, ModIntf, ModDelegate, DistributedDataParallel};
+use tensor::{Tensor, THVec};
+use torch;
+use utils::data::DistributedSampler;
+
+fn shards(len: usize, num_replicas: usize, epoch: usize) -> Vec<Vec<usize>> {
+    (0..num_replicas)
+        .map(|rank| {
+                 let sampler = DistributedSampler::new(len, 4, rank, num_replicas, true, 7);
+                 sampler.set_epoch(epoch);
+                 sampler.data().concat()
+             })
+        .collect()
+}
+
+#[test]
+fn distributed_sampler_shards_are_disjoint() {
+    let shards = shards(12, 3, 0);
+    let mut seen = HashSet::new();
+    for shard in &shards {
+        assert_eq!(shard.len(), 4);
+        for idx in shard {
+            assert!(seen.insert(*idx), "{} in more than one shard", idx);
+        }
+    }
+    assert_eq!(seen, (0..12).collect::<HashSet<_>>());
+}
+
+#[test]
+fn distributed_sampler_pads_to_equal_shards() {
+    let shards = shards(10, 3, 0);
+    let mut seen = HashSet::new();
+    for shard in &shards {
+        assert_eq!(shard.len(), 4);
+        seen.extend(shard.iter().cloned());
+    }
+    // two of the ten indices are repeated to fill the last round
+    assert_eq!(seen, (0..10).collect::<HashSet<_>>());
+}
+
+#[test]
+fn distributed_sampler_set_epoch_reshuffles() {
+    assert_eq!(shards(100, 2, 1), shards(100, 2, 1));
+    assert!(shards(100, 2, 1) != shards(100, 2, 2));
+}
+
+fn ramp(dims: Vec<usize>, scale: f32) -> Tensor<f32> {
+    let n = dims.iter().product();
+    torch::tensor(THVec::new(dims, (0..n).map(|i| ((i * 7 % 11) as f32 - 5.) * scale).collect()))
+}
+
+fn grads(model: &mut ModIntf<f32>) -> Vec<Vec<f32>> {
+    let mut grads = Vec::new();
+    model.apply_parameters(&mut |v| if let Some(ref mut g) = *v.grad() {
+                               grads.push(g.data_borrow().as_slice().to_vec())
+                           });
+    grads
+}
+
+// every rank sets its gradients to (rank + 1) * ramp and syncs them,
+// returning what each rank ends up with
+fn sync_gradients(name: &str, flatten: bool) -> Vec<Vec<Vec<f32>>> {
+    // 16 floats per bucket, less than the 18 element weight
+    let (world_size, capacity) = (3, 64);
+    let path = shm_path(&format!("{}-{}", name, ::std::process::id()));
+    ProcessGroup::create(&path, world_size, capacity).unwrap();
+    let handles: Vec<_> = (0..world_size)
+        .map(|rank| {
+            let path = path.clone();
+            thread::spawn(move || {
+                let group = ProcessGroup::open(path, rank, world_size, capacity).unwrap();
+                let mut fc = nn::Linear::<f32>::build(6, 3).done();
+                if flatten {
+                    fc.flatten_parameters();
+                }
+                let mut ddp = DistributedDataParallel::new(group, &mut fc);
+                let scale = (rank + 1) as f32;
+                if flatten {
+                    let arena = fc.delegate()._arena.as_mut().unwrap();
+                    let n = arena.len();
+                    arena.grads.copy_(&ramp(vec![n], scale));
+                } else {
+                    fc.apply_parameters(&mut |v| {
+                                            let size = v.data_borrow().size();
+                                            *v.grad() = Some(Variable::new(ramp(size, scale)));
+                                        });
+                }
+                ddp.sync_gradients(&mut fc);
+                grads(&mut fc)
+            })
+        })
+        .collect();
+    let grads = handles.into_iter().map(|h| h.join().unwrap()).collect();
+    remove_shm(&path).unwrap();
+    grads
+}
+
+// the average of 1, 2 and 3 times the same gradient
+fn check_average(grads: Vec<Vec<Vec<f32>>>, flatten: bool) {
+    let mut expected = Vec::new();
+    if flatten {
+        let all = ramp(vec![18 + 3], 2.).as_slice().to_vec();
+        expected.push(all[..18].to_vec());
+        expected.push(all[18..].to_vec());
+    } else {
+        expected.push(ramp(vec![3, 6], 2.).as_slice().to_vec());
+        expected.push(ramp(vec![3], 2.).as_slice().to_vec());
+    }
+    for rank_grads in grads {
+        assert_eq!(rank_grads.len(), expected.len());
+        for (actual, expected) in rank_grads.iter().zip(expected.iter()) {
+            for (x, y) in actual.iter().zip(expected.iter()) {
+                assert!((x - y).abs() < 1e-5, "{} vs {}", x, y);
+            }
+        }
+    }
+}
+
+#[test]
+fn sync_gradients_averages_buckets() {
+    check_average(sync_gradients("ddp-buckets", false), false);
+}
+
+#[test]
+fn sync_gradients_averages_arena() {
+    check_average(sync_gradients("ddp-arena", true), true);
+}
+
+#[test]
+fn all_reduce_threads() {
+    let (world_size, capacity) = (3, 64);
+    let path = shm_path(&format!("test-{}", ::std::process::id()));
+    ProcessGroup::create(&path, world_size, capacity).unwrap();
+    let handles: Vec<_> = (0..world_size)
+        .map(|rank| {
+            let path = path.clone();
+            thread::spawn(move || {
+                let mut pg = ProcessGroup::open(path, rank, world_size, capacity).unwrap();
+                // longer than one bucket to exercise chunking
+                let mut data: Vec<f32> = (0..37).map(|i| (i * (rank + 1)) as f32).collect();
+                pg.all_reduce(&mut data);
+                data
+            })
+        })
+        .collect();
+    for handle in handles {
+        let data = handle.join().unwrap();
+        for (i, v) in data.iter().enumerate() {
+            assert_eq!(*v, (i * 6) as f32);
+        }
+    }
+    remove_shm(&path).unwrap();
+}
+
+#[test]
+fn barrier_abort() {
+    let (world_size, capacity) = (2, 64);
+    let path = shm_path(&format!("test-abort-{}", ::std::process::id()));
+    ProcessGroup::create(&path, world_size, capacity).unwrap();
+    let waiter = {
+        let path = path.clone();
+        thread::spawn(move || {
+            let pg = ProcessGroup::open(path, 0, world_size, capacity).unwrap();
+            pg.barrier();
+        })
+    };
+    // rank 1 dies before ever reaching the barrier
+    let result = {
+        let path = path.clone();
+        thread::spawn(move || {
+            let _pg = ProcessGroup::open(path, 1, world_size, capacity).unwrap();
+            panic!("worker failed");
+        })
+    }
+    .join();
+    assert!(result.is_err());
+    assert!(waiter.join().is_err());
+    remove_shm(&path).unwrap();
+}
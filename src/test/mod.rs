@@ -1,2 +1,6 @@
 pub mod tests;
+pub mod quantized;
+pub mod arena;
+pub mod checkpoint;
+pub mod distributed;
 //pub mod common;
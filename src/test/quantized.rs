@@ -0,0 +1,97 @@
+use autograd::Variable;
+use nn::{self, ModIntf};
+use nn::functional as F;
+use nn::_functions::Conv2dFArgs;
+use nn::quantized::{self, MinMaxObserver, PackedWeight};
+use optim;
+use tensor::Tensor;
+use torch::{self, Checkpoint};
+
+fn uniform(dims: Vec<usize>) -> Variable<f32> {
+    let mut t: Tensor<f32> = torch::tensor(dims);
+    t.uniform_((-1., 1.));
+    Variable::new(t)
+}
+
+// the error of a k term int8 dot product grows like sqrt(k)
+fn assert_close(a: &Tensor<f32>, b: &Tensor<f32>, k: usize) {
+    let tol = 0.02 * (k as f32).sqrt();
+    assert_eq!(a.size(), b.size());
+    for (x, y) in a.as_slice().iter().zip(b.as_slice()) {
+        assert!((x - y).abs() < tol, "{} vs {}", x, y);
+    }
+}
+
+fn sgd() -> optim::SGD {
+    optim::SGD::new(map_opt!{"lr" => 0.1})
+}
+
+fn pack(input: &Variable<f32>, weight: &Variable<f32>, bias: &Variable<f32>) -> PackedWeight {
+    let mut observer = MinMaxObserver::new();
+    observer.observe(input.data_borrow());
+    PackedWeight::new(weight.data_borrow(), Some(bias.data_borrow()), observer.qparams())
+}
+
+#[test]
+fn linear_matches_float() {
+    // neither dimension a multiple of the register tile
+    let (batch, in_features, out_features) = (7, 33, 17);
+    let x = uniform(vec![batch, in_features]);
+    let (mut weight, mut bias) = (uniform(vec![out_features, in_features]),
+                                  uniform(vec![out_features]));
+    let packed = pack(&x, &weight, &bias);
+    let expected = F::linear(&x, &mut weight, Some(&mut bias));
+    assert_close(&packed.linear(x.data_borrow(), false),
+                 expected.data_borrow(),
+                 in_features);
+    assert_close(&packed.linear(x.data_borrow(), true),
+                 F::relu(expected).data_borrow(),
+                 in_features);
+}
+
+#[test]
+fn conv2d_matches_float() {
+    let (batch, c, h, w, out_features, kh, kw) = (3, 4, 9, 8, 5, 3, 2);
+    for &(stride, padding) in &[(1, 0), (2, 1), (1, 2)] {
+        let mut x = uniform(vec![batch, c, h, w]);
+        let (mut weight, mut bias) = (uniform(vec![out_features, c, kh, kw]),
+                                      uniform(vec![out_features]));
+        let mut args = Conv2dFArgs {
+            in_features: c,
+            out_features: out_features,
+            kernel_size: vec![kh as i32, kw as i32],
+            stride: vec![stride, stride],
+            padding: vec![padding, padding],
+            dilation: vec![1, 1],
+            groups: 1,
+        };
+        let packed = pack(&x, &weight, &bias);
+        let actual = packed.conv2d(x.data_borrow(), &args, false);
+        let expected = F::conv2d(&mut x, &mut weight, Some(&mut bias), &mut args);
+        assert_close(&actual, expected.data_borrow(), c * kh * kw);
+    }
+}
+
+#[test]
+fn linear_repacks_restored_weights() {
+    let mut fc = nn::Linear::<f32>::build(16, 8).done();
+    let x = uniform(vec![4, 16]);
+    quantized::prepare(&mut fc);
+    fc.eval();
+    let float = fc.f(x.clone());
+    quantized::convert(&mut fc);
+    // converted modules keep using the float weights until enabled
+    assert_eq!(fc.f(x.clone()).data_borrow().as_slice(),
+               float.data_borrow().as_slice());
+    quantized::enable(&mut fc);
+    fc.f(x.clone());
+    // overwrite the packed layer's parameters in place
+    let mut other = nn::Linear::<f32>::build(16, 8).done();
+    let generation = quantized::generation();
+    Checkpoint::<f32>::new(&mut other, &mut sgd())
+        .restore(&mut fc, &mut sgd())
+        .unwrap();
+    assert!(quantized::generation() != generation);
+    let int8 = fc.f(x.clone());
+    assert_close(int8.data_borrow(), other.f(x.clone()).data_borrow(), 16);
+}
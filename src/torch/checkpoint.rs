@@ -0,0 +1,274 @@
+use std::collections::HashMap;
+use std::fs::File;
+use std::io::{self, Read, Error, ErrorKind};
+use std::path::{Path, PathBuf};
+use std::sync::mpsc::{channel, sync_channel, SyncSender, Receiver, TryRecvError};
+use std::thread::{self, JoinHandle};
+
+use rmps::{Deserializer, Serializer};
+use serde::{Serialize, Deserialize};
+use serde::de::DeserializeOwned;
+
+use autograd::VarId;
+use nn::{ModIntf, ModDelegate};
+use nn::quantized;
+use optim::{OptIntf, ParamState};
+use tensor::{Tensor, NumLimits, THVec};
+use torch::write_atomic;
+use utils::TRVal;
+
+// ParamState keys are &'static str, so restored entries are matched
+// against the keys the optimizers actually use; add new tensor valued
+// state here
+static STATE_KEYS: [&'static str; 1] = ["momentum_buffer"];
+
+/// Owned copy of a contiguous tensor that can cross threads.
+#[derive(Serialize, Deserialize, Clone)]
+pub struct TensorSnapshot<T> {
+    pub dims: Vec<usize>,
+    pub data: Vec<T>,
+}
+
+impl<T: NumLimits> TensorSnapshot<T> {
+    pub fn new(t: &Tensor<T>) -> Self {
+        TensorSnapshot {
+            dims: t.size(),
+            data: t.as_slice().to_vec(),
+        }
+    }
+    pub fn restore(&self, t: &mut Tensor<T>) -> io::Result<()> {
+        if t.size() != self.dims {
+            return Err(Error::new(ErrorKind::InvalidData,
+                                  format!("size mismatch {:?} vs {:?}", t.size(), self.dims)));
+        }
+        t.as_mut_slice().copy_from_slice(self.data.as_slice());
+        Ok(())
+    }
+    pub fn to_tensor(&self) -> Tensor<T> {
+        ::torch::tensor(THVec::new(self.dims.clone(), self.data.clone()))
+    }
+}
+
+fn snapshot_state<T>(param: isize, param_state: &ParamState, out: &mut Vec<StateSnapshot<T>>)
+    where T: NumLimits + From<TRVal>
+{
+    for (key, value) in param_state.iter() {
+        if let TRVal::Tensor(ref t) = *value {
+            let t: Tensor<T> = t.clone().into();
+            out.push(StateSnapshot {
+                         param: param,
+                         key: key.to_string(),
+                         value: TensorSnapshot::new(&t),
+                     });
+        }
+    }
+}
+
+#[derive(Serialize, Deserialize, Clone)]
+pub struct StateSnapshot<T> {
+    // index in apply_parameters order, -1 for a flattened ParamArena
+    pub param: isize,
+    pub key: String,
+    pub value: TensorSnapshot<T>,
+}
+
+/// Model parameters and tensor valued optimizer state (e.g. SGD
+/// momentum buffers) copied out of the training thread.
+#[derive(Serialize, Deserialize, Clone)]
+pub struct Checkpoint<T> {
+    pub params: Vec<TensorSnapshot<T>>,
+    pub state: Vec<StateSnapshot<T>>,
+}
+
+impl<T: NumLimits + From<TRVal>> Checkpoint<T> {
+    pub fn new(model: &mut ModIntf<T>, optimizer: &mut OptIntf<T>) -> Self {
+        let mut params = Vec::new();
+        let mut index: HashMap<VarId, isize> = HashMap::new();
+        model.apply_parameters(&mut |v| {
+                                   index.insert(v.id, params.len() as isize);
+                                   params.push(TensorSnapshot::new(v.data_borrow()));
+                               });
+        let mut state = Vec::new();
+        let optimizer = optimizer.optimizer();
+        for (id, param_state) in optimizer.state.iter() {
+            if let Some(param) = index.get(id) {
+                snapshot_state::<T>(*param, &param_state.borrow(), &mut state);
+            }
+        }
+        snapshot_state::<T>(-1, &optimizer.arena_state, &mut state);
+        Checkpoint {
+            params: params,
+            state: state,
+        }
+    }
+    /// Copy the checkpoint back into an identically built model and
+    /// optimizer.  Nothing is modified unless every entry fits.
+    pub fn restore(&self, model: &mut ModIntf<T>, optimizer: &mut OptIntf<T>) -> io::Result<()> {
+        let mut vars = Vec::new();
+        model.apply_parameters(&mut |v| vars.push(v.clone()));
+        if vars.len() != self.params.len() {
+            return Err(Error::new(ErrorKind::InvalidData, "parameter count mismatch"));
+        }
+        for (v, snapshot) in vars.iter().zip(self.params.iter()) {
+            if v.data_borrow().size() != snapshot.dims {
+                return Err(Error::new(ErrorKind::InvalidData,
+                                      format!("size mismatch {:?} vs {:?}",
+                                              v.data_borrow().size(),
+                                              snapshot.dims)));
+            }
+        }
+        // arena state only fits a flattened model, per parameter state
+        // only an unflattened one
+        let flattened = model.delegate()._arena.is_some();
+        let mut keys = Vec::with_capacity(self.state.len());
+        for entry in &self.state {
+            if entry.param < -1 || entry.param >= vars.len() as isize {
+                return Err(Error::new(ErrorKind::InvalidData, "bad state index"));
+            }
+            if (entry.param == -1) != flattened {
+                return Err(Error::new(ErrorKind::InvalidData,
+                                      "optimizer state doesn't match the model's parameter arena"));
+            }
+            match STATE_KEYS.iter().find(|k| **k == entry.key) {
+                Some(key) => keys.push(*key),
+                None => {
+                    return Err(Error::new(ErrorKind::InvalidData,
+                                          format!("unknown optimizer state {:?}", entry.key)))
+                }
+            }
+        }
+        for (v, snapshot) in vars.iter_mut().zip(self.params.iter()) {
+            snapshot.restore(v.data())?;
+        }
+        quantized::weights_changed();
+        let optimizer = optimizer.optimizer();
+        for (entry, key) in self.state.iter().zip(keys) {
+            let param_state = if entry.param < 0 {
+                &mut optimizer.arena_state
+            } else {
+                &mut optimizer.state[vars[entry.param as usize].id]
+            };
+            param_state.insert(key, entry.value.to_tensor().into());
+        }
+        Ok(())
+    }
+}
+
+impl<T: Serialize> Checkpoint<T> {
+    pub fn encode(&self) -> Vec<u8> {
+        let mut encoded = Vec::new();
+        self.serialize(&mut Serializer::new(&mut encoded)).unwrap();
+        encoded
+    }
+    pub fn save<P>(&self, path: P) -> io::Result<()>
+        where P: AsRef<Path>
+    {
+        write_atomic(path, self.encode().as_slice())
+    }
+}
+
+pub fn load_checkpoint<P, T>(path: P) -> io::Result<Checkpoint<T>>
+    where P: AsRef<Path>,
+          T: DeserializeOwned
+{
+    let mut buffer = File::open(path)?;
+    let mut encoded = Vec::new();
+    buffer.read_to_end(&mut encoded)?;
+    let mut de = Deserializer::new(&encoded[..]);
+    Deserialize::deserialize(&mut de).map_err(|e| Error::new(ErrorKind::InvalidData, format!("{:?}", e)))
+}
+
+/// Writes checkpoints on a background thread.  `save` only takes the
+/// snapshot on the calling thread; encoding, writing, fsync and the
+/// atomic rename happen in the background.  At most `max_in_flight`
+/// checkpoints are queued or being written; once the limit is hit
+/// `save` blocks until the oldest one is done.
+pub struct AsyncCheckpointer<T: NumLimits> {
+    jobs: Option<SyncSender<(PathBuf, Checkpoint<T>)>>,
+    done: Receiver<io::Result<()>>,
+    in_flight: usize,
+    worker: Option<JoinHandle<()>>,
+}
+
+impl<T: NumLimits + From<TRVal> + Send + 'static> AsyncCheckpointer<T> {
+    pub fn new(max_in_flight: usize) -> Self {
+        assert!(max_in_flight > 0);
+        // one checkpoint is being written while the rest wait in the channel
+        let (job_tx, job_rx) = sync_channel::<(PathBuf, Checkpoint<T>)>(max_in_flight - 1);
+        let (done_tx, done_rx) = channel();
+        let worker = thread::spawn(move || for (path, checkpoint) in job_rx {
+                                       if done_tx.send(checkpoint.save(path)).is_err() {
+                                           break;
+                                       }
+                                   });
+        AsyncCheckpointer {
+            jobs: Some(job_tx),
+            done: done_rx,
+            in_flight: 0,
+            worker: Some(worker),
+        }
+    }
+    /// Snapshot `model` and `optimizer` and queue the checkpoint for
+    /// `path`.  Errors from earlier checkpoints are reported here.
+    pub fn save<P>(&mut self,
+                   path: P,
+                   model: &mut ModIntf<T>,
+                   optimizer: &mut OptIntf<T>)
+                   -> io::Result<()>
+        where P: AsRef<Path>
+    {
+        self.poll()?;
+        let checkpoint = Checkpoint::new(model, optimizer);
+        self.jobs
+            .as_ref()
+            .unwrap()
+            .send((path.as_ref().to_path_buf(), checkpoint))
+            .map_err(|_| Error::new(ErrorKind::Other, "checkpoint writer exited"))?;
+        self.in_flight += 1;
+        Ok(())
+    }
+    /// Collect finished checkpoints without blocking.
+    pub fn poll(&mut self) -> io::Result<()> {
+        let mut result = Ok(());
+        loop {
+            match self.done.try_recv() {
+                Ok(r) => {
+                    self.in_flight -= 1;
+                    if result.is_ok() {
+                        result = r;
+                    }
+                }
+                Err(TryRecvError::Empty) => break,
+                Err(TryRecvError::Disconnected) => {
+                    self.in_flight = 0;
+                    break;
+                }
+            }
+        }
+        result
+    }
+    /// Block until every queued checkpoint is on disk.
+    pub fn wait(&mut self) -> io::Result<()> {
+        let mut result = Ok(());
+        while self.in_flight > 0 {
+            let r = self.done
+                .recv()
+                .unwrap_or_else(|_| Err(Error::new(ErrorKind::Other, "checkpoint writer exited")));
+            self.in_flight -= 1;
+            if result.is_ok() {
+                result = r;
+            }
+        }
+        result
+    }
+}
+
+impl<T: NumLimits> Drop for AsyncCheckpointer<T> {
+    fn drop(&mut self) {
+        // let queued checkpoints finish before going away
+        self.jobs.take();
+        if let Some(worker) = self.worker.take() {
+            let _ = worker.join();
+        }
+    }
+}
@@ -1,6 +1,8 @@
 pub mod serde;
 pub mod tensor;
 pub mod autograd;
+pub mod checkpoint;
 
 pub use self::serde::*;
 pub use self::tensor::*;
+pub use self::checkpoint::*;
@@ -1,19 +1,56 @@
-use std::fs::File;
+use std::fs::{self, File, OpenOptions};
+use std::process;
+use std::sync::atomic::{AtomicUsize, Ordering, ATOMIC_USIZE_INIT};
 
 use rmps::{Deserializer, Serializer};
 use serde::{Deserialize, Serialize};
 
-use std::path::Path;
+use std::path::{Path, PathBuf};
 use std::io;
 use std::io::{Write, Read, Error, ErrorKind};
 
+static TMP_COUNTER: AtomicUsize = ATOMIC_USIZE_INIT;
+
+// write to a temporary file next to path, fsync it and rename it over
+// path, so readers only ever see a complete file.  The temporary name
+// is unique per process and call, so concurrent writers to the same
+// path can't clobber each other's half written files.
+pub fn write_atomic<P>(path: P, data: &[u8]) -> io::Result<()>
+    where P: AsRef<Path>
+{
+    let path = path.as_ref();
+    let mut tmp = path.as_os_str().to_owned();
+    tmp.push(format!(".{}.{}.tmp",
+                     process::id(),
+                     TMP_COUNTER.fetch_add(1, Ordering::Relaxed)));
+    let tmp = PathBuf::from(tmp);
+    let written = OpenOptions::new()
+        .write(true)
+        .create_new(true)
+        .open(&tmp)
+        .and_then(|mut buffer| {
+                      buffer.write_all(data)?;
+                      buffer.sync_all()
+                  })
+        .and_then(|_| fs::rename(&tmp, path));
+    if let Err(e) = written {
+        let _ = fs::remove_file(&tmp);
+        return Err(e);
+    }
+    // make the rename itself durable
+    match path.parent() {
+        Some(dir) if !dir.as_os_str().is_empty() => File::open(dir)?.sync_all(),
+        _ => File::open(".")?.sync_all(),
+    }
+}
+
 pub fn save<P, T: Serialize>(path: P, arg: &Vec<T>) -> io::Result<usize>
     where P: AsRef<Path>
 {
-    let mut buffer = File::create(path)?;
     let mut encoded = Vec::new();
     arg.serialize(&mut Serializer::new(&mut encoded)).unwrap();
-    buffer.write(encoded.as_slice())
+    write_atomic(path, encoded.as_slice())?;
+    Ok(encoded.len())
 }
 
 pub fn load<'a, P, T: 'a + Deserialize<'a>>(path: P) -> io::Result<Vec<T>>
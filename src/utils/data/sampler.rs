@@ -1,4 +1,6 @@
 use std::rc::Rc;
+use std::cell::Cell;
+use rand::{Rng, SeedableRng, StdRng};
 
 #[derive(Clone)]
 pub struct Sampler {
@@ -7,6 +9,9 @@ pub struct Sampler {
 }
 
 impl Sampler {
+    pub fn set_epoch(&self, epoch: usize) {
+        self.value.set_epoch(epoch)
+    }
     pub fn data(&self) -> Vec<Vec<usize>> {
         self.value
             .data()
@@ -26,6 +31,7 @@ fn indices(len: usize) -> Vec<usize> {
 
 pub trait SamplerIntf {
     fn data(&self) -> Vec<usize>;
+    fn set_epoch(&self, _epoch: usize) {}
 }
 
 pub struct SequentialSampler {
@@ -80,6 +86,69 @@ impl RandomSampler {
     }
 }
 
+/// Restricts each of `num_replicas` data parallel workers to its own
+/// shard of the dataset.  Every worker shuffles with the same seed and
+/// epoch so the shards stay disjoint, and the index list is padded so
+/// all workers see the same number of batches.  Call `set_epoch` at the
+/// start of each epoch to get a different shuffle.
+pub struct DistributedSampler {
+    indices: Vec<usize>,
+    rank: usize,
+    num_replicas: usize,
+    shuffle: bool,
+    seed: usize,
+    epoch: Cell<usize>,
+}
+
+impl SamplerIntf for DistributedSampler {
+    fn data(&self) -> Vec<usize> {
+        let mut indices = self.indices.clone();
+        if self.shuffle {
+            let mut rng: StdRng = SeedableRng::from_seed(&[self.seed, self.epoch.get()][..]);
+            rng.shuffle(&mut indices);
+        }
+        let total = (indices.len() + self.num_replicas - 1) / self.num_replicas *
+                    self.num_replicas;
+        for i in 0..total - indices.len() {
+            let idx = indices[i];
+            indices.push(idx);
+        }
+        let (rank, num_replicas) = (self.rank, self.num_replicas);
+        indices
+            .into_iter()
+            .enumerate()
+            .filter(|&(i, _)| i % num_replicas == rank)
+            .map(|(_, idx)| idx)
+            .collect()
+    }
+    fn set_epoch(&self, epoch: usize) {
+        self.epoch.set(epoch);
+    }
+}
+
+impl DistributedSampler {
+    pub fn new(len: usize,
+               batch_size: usize,
+               rank: usize,
+               num_replicas: usize,
+               shuffle: bool,
+               seed: usize)
+               -> Sampler {
+        assert!(rank < num_replicas);
+        Sampler {
+            value: Rc::new(DistributedSampler {
+                               indices: indices(len),
+                               rank: rank,
+                               num_replicas: num_replicas,
+                               shuffle: shuffle,
+                               seed: seed,
+                               epoch: Cell::new(0),
+                           }),
+            batch_size: batch_size,
+        }
+    }
+}
+
 /*
 pub struct WeightedRandomSampler<'a, T: Clone + 'a, R:Clone + 'a> {
     data_source: Dataset<'a, T, R>,
@@ -1,4 +1,5 @@
 use std::collections::HashMap;
+use std::collections::hash_map;
 use std::cell::{Cell, RefCell};
 use std::hash::Hash;
 use std::ops::{Index, IndexMut};
@@ -12,6 +13,9 @@ impl<K: Eq + Hash, V: Default> MutMap<K, V> {
     pub fn new() -> Self {
         MutMap { map: HashMap::new() }
     }
+    pub fn iter(&self) -> hash_map::Iter<K, RefCell<V>> {
+        self.map.iter()
+    }
 }
 
 impl<K: Hash + Eq + Clone + Debug, V: Default> Index<K> for MutMap<K, V> {